@@ -1,5 +1,6 @@
-from functools import lru_cache
+from functools import cached_property, lru_cache
 
+from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -7,15 +8,22 @@ class Settings(BaseSettings):
     app_name: str = "One Stop Resume Engine"
     api_v1_prefix: str = "/api/v1"
     cors_origins: str = "http://localhost:5173"
+    frontend_base_url: str = ""
     enable_transformer_embeddings: bool = False
     embedding_model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+    embedding_backend: str = "torch"
+    embedding_onnx_file_name: str = "onnx/model_qint8_avx512_vnni.onnx"
+    resume_embedding_cache_size: int = 5000
+    text_embedding_cache_size: int = 1000
     gmail_credentials_path: str = "credentials.json"
     gmail_token_path: str = "token.json"
     gmail_resume_label: str = ""
     gmail_max_attachment_size_mb: int = 2
     gmail_max_attachments_per_import: int = 8
+    gmail_fetch_workers: int = 4
     resume_max_text_characters: int = 25000
     resume_pdf_max_pages: int = 12
+    resume_parse_workers: int = 2
     linkedin_client_id: str = ""
     linkedin_client_secret: str = ""
     linkedin_token_path: str = "linkedin_token.json"
@@ -27,9 +35,14 @@ class Settings(BaseSettings):
         case_sensitive=False,
     )
 
-    @property
-    def cors_origins_list(self) -> list[str]:
-        return [origin.strip() for origin in self.cors_origins.split(",") if origin.strip()]
+    @field_validator("frontend_base_url", mode="after")
+    @classmethod
+    def _strip_frontend_base_url(cls, value: str) -> str:
+        return value.strip().rstrip("/")
+
+    @cached_property
+    def cors_origins_list(self) -> tuple[str, ...]:
+        return tuple(origin.strip() for origin in self.cors_origins.split(",") if origin.strip())
 
 
 @lru_cache
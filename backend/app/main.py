@@ -1,13 +1,39 @@
+import asyncio
+import hashlib
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import ORJSONResponse
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.types import Scope
 
 from app.core.config import settings
 from app.routers import api_router
+from app.services.linkedin_client import aclose_linkedin_resume_client
+from app.services.matcher import warm_up_transformer
 
-app = FastAPI(title=settings.app_name, version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    # Load the embedding model before serving instead of on the first match request.
+    await asyncio.to_thread(warm_up_transformer)
+    yield
+    await aclose_linkedin_resume_client()
+
+
+app = FastAPI(
+    title=settings.app_name,
+    version="0.1.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,22 +46,75 @@ app.add_middleware(
 app.include_router(api_router, prefix=settings.api_v1_prefix)
 
 web_dir = Path(__file__).resolve().parent / "web"
-web_dir_resolved = web_dir.resolve()
+web_root = os.path.normpath(str(web_dir))
+web_root_prefix = web_root + os.sep
 index_file = web_dir / "index.html"
 
+# The SPA shell is tiny and only changes on deploy, so keep it in memory.
+try:
+    INDEX_BYTES: bytes | None = index_file.read_bytes()
+except FileNotFoundError:
+    INDEX_BYTES = None
+INDEX_ETAG = f'"{hashlib.sha1(INDEX_BYTES).hexdigest()}"' if INDEX_BYTES is not None else ""
+
+# Vite writes content-hashed bundles under `assets/`, so their URLs never serve new bytes.
+HASHED_ASSETS_PREFIX = "assets" + os.sep
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+API_PREFIX_PATH = os.path.normpath(settings.api_v1_prefix.strip("/"))
+API_PREFIX_PATHS = (API_PREFIX_PATH + os.sep,)
+# A miss on one of these is a broken asset URL, not a client-side route.
+ASSET_EXTENSIONS = (".js", ".css", ".map", ".png", ".jpg", ".svg", ".ico", ".woff", ".woff2", ".json")
+
+
+def _index_response(scope: Scope) -> Response:
+    if INDEX_BYTES is None:
+        raise HTTPException(status_code=404, detail="Frontend build not found.")
+    headers = {"ETag": INDEX_ETAG, "Cache-Control": "no-cache, must-revalidate"}
+    if Headers(scope=scope).get("if-none-match") == INDEX_ETAG:
+        return Response(status_code=304, headers=headers)
+    return Response(content=INDEX_BYTES, media_type="text/html", headers=headers)
+
+
+class SPAStaticFiles(StaticFiles):
+    """Serve the frontend build, falling back to `index.html` for client-side routes."""
+
+    async def check_config(self) -> None:
+        # A missing build is reported per request as a 404 instead of a startup error.
+        return None
+
+    def lookup_path(self, path: str) -> tuple[str, os.stat_result | None]:
+        # `web_dir` is already resolved, so a lexical prefix check replaces the
+        # per-request `realpath` and leaves a single `stat` call.
+        full_path = os.path.normpath(os.path.join(web_root, path))
+        if full_path != web_root and not full_path.startswith(web_root_prefix):
+            return "", None
+        try:
+            return full_path, os.stat(full_path)
+        except (FileNotFoundError, NotADirectoryError):
+            return "", None
 
-@app.get("/", include_in_schema=False)
-async def serve_root() -> FileResponse:
-    if index_file.exists():
-        return FileResponse(index_file)
-    raise HTTPException(status_code=404, detail="Frontend build not found.")
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        # The index shortcuts below skip Starlette's own method check, so do it first.
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        if path in {".", "index.html"}:
+            return _index_response(scope)
+        if path == API_PREFIX_PATH or path.startswith(API_PREFIX_PATHS):
+            raise HTTPException(status_code=404)
+        if "." not in os.path.basename(path):
+            # Extensionless paths are client-side routes; skip the filesystem.
+            return _index_response(scope)
+        try:
+            response = await super().get_response(path, scope)
+        except HTTPException as exc:
+            if exc.status_code != 404 or path.endswith(ASSET_EXTENSIONS):
+                raise
+            return _index_response(scope)
+        if path.startswith(HASHED_ASSETS_PREFIX):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
 
 
-@app.get("/{full_path:path}", include_in_schema=False)
-async def serve_spa(full_path: str) -> FileResponse:
-    candidate = (web_dir / full_path).resolve()
-    if str(candidate).startswith(str(web_dir_resolved)) and candidate.is_file():
-        return FileResponse(candidate)
-    if index_file.exists():
-        return FileResponse(index_file)
-    raise HTTPException(status_code=404, detail="Frontend build not found.")
+# Mounted last so `/api/v1/*` routes are matched before the SPA catch-all.
+app.mount("/", SPAStaticFiles(directory=web_dir, html=True, check_dir=False), name="spa")
@@ -1,6 +1,19 @@
+import string
+from functools import cached_property
+
 from pydantic import BaseModel, Field
 
 
+# ASCII punctuation that separates text tokens. "+", "#", "." and "-" stay inside
+# tokens so names like "c++", "c#", "node.js" and "ci-cd" survive intact.
+_TOKEN_SEPARATORS = "".join(char for char in string.punctuation if char not in "+#.-").encode("ascii")
+_TOKEN_SEPARATOR_TABLE = bytes.maketrans(_TOKEN_SEPARATORS, b" " * len(_TOKEN_SEPARATORS))
+
+
+def normalize_skill(value: str) -> str:
+    return value.strip().lower()
+
+
 class JobCreate(BaseModel):
     title: str = Field(min_length=2, max_length=120)
     description: str = Field(min_length=20)
@@ -10,6 +23,11 @@ class JobCreate(BaseModel):
 class Job(JobCreate):
     id: int
 
+    @cached_property
+    def normalized_required_skills(self) -> tuple[str, ...]:
+        """Required skills as the matcher compares them, blanks dropped, in order."""
+        return tuple(normalize_skill(skill) for skill in self.required_skills if skill.strip())
+
 
 class ResumeCreate(BaseModel):
     candidate_name: str = Field(min_length=2, max_length=120)
@@ -20,6 +38,22 @@ class ResumeCreate(BaseModel):
 class Resume(ResumeCreate):
     id: int
 
+    @cached_property
+    def normalized_skills(self) -> frozenset[str]:
+        return frozenset(normalize_skill(skill) for skill in self.skills)
+
+    @cached_property
+    def text_lower(self) -> str:
+        return self.text.lower()
+
+    @cached_property
+    def text_tokens(self) -> frozenset[str]:
+        """Distinct tokens of `text_lower`; each one is a substring of it."""
+        # A byte-table translate is one C pass; only ASCII bytes are remapped, so the
+        # UTF-8 sequences of other characters come back intact.
+        translated = self.text_lower.encode("utf-8").translate(_TOKEN_SEPARATOR_TABLE)
+        return frozenset(translated.decode("utf-8").split())
+
 
 class GmailImportResponse(BaseModel):
     imported_count: int
@@ -1,3 +1,4 @@
+import asyncio
 from urllib.parse import quote
 
 from fastapi import APIRouter, Request
@@ -5,7 +6,7 @@ from fastapi.responses import RedirectResponse
 from pydantic import BaseModel
 
 from app.core.config import settings
-from app.services.gmail_client import GmailAuthRequiredError, gmail_resume_client
+from app.services.gmail_client import GmailAuthRequiredError, get_gmail_resume_client
 
 router = APIRouter()
 
@@ -21,18 +22,18 @@ class GmailConnectionStatus(BaseModel):
 
 
 def _app_base_url(request: Request) -> str:
-    return str(request.base_url).rstrip("/")
+    return settings.frontend_base_url or str(request.base_url).rstrip("/")
 
 
 def _callback_url(request: Request) -> str:
-    return f"{_app_base_url(request)}{settings.api_v1_prefix}/gmail/oauth/callback"
+    return str(request.url_for("gmail_oauth_callback"))
 
 
 @router.get("/status", response_model=GmailConnectionStatus)
 def gmail_status(request: Request) -> GmailConnectionStatus:
-    config_status = gmail_resume_client.config_status()
+    config_status = get_gmail_resume_client().config_status()
     return GmailConnectionStatus(
-        connected=gmail_resume_client.is_connected(),
+        connected=get_gmail_resume_client().is_connected(),
         configured=bool(config_status["configured"]),
         ready_for_browser_oauth=bool(config_status["ready_for_browser_oauth"]),
         client_type=str(config_status["client_type"]),
@@ -42,13 +43,13 @@ def gmail_status(request: Request) -> GmailConnectionStatus:
     )
 
 
-@router.get("/oauth/start")
+@router.get("/oauth/start", name="gmail_oauth_start")
 def gmail_oauth_start(
     request: Request,
     next_provider: str | None = None,
 ) -> RedirectResponse:
     try:
-        auth_url = gmail_resume_client.start_browser_oauth(
+        auth_url = get_gmail_resume_client().start_browser_oauth(
             redirect_uri=_callback_url(request),
             next_provider=next_provider,
         )
@@ -59,8 +60,8 @@ def gmail_oauth_start(
     return RedirectResponse(url=auth_url, status_code=302)
 
 
-@router.get("/oauth/callback")
-def gmail_oauth_callback(
+@router.get("/oauth/callback", name="gmail_oauth_callback")
+async def gmail_oauth_callback(
     request: Request,
     state: str | None = None,
     code: str | None = None,
@@ -81,7 +82,9 @@ def gmail_oauth_callback(
         )
 
     try:
-        next_provider = gmail_resume_client.finish_browser_oauth(
+        # The google-auth token exchange is blocking, so keep it off the event loop.
+        next_provider = await asyncio.to_thread(
+            get_gmail_resume_client().finish_browser_oauth,
             state=state,
             code=code,
             redirect_uri=_callback_url(request),
@@ -99,7 +102,7 @@ def gmail_oauth_callback(
 
     if next_provider == "linkedin":
         return RedirectResponse(
-            url=f"{base_url}{settings.api_v1_prefix}/linkedin/oauth/start",
+            url=str(request.url_for("linkedin_oauth_start")),
             status_code=302,
         )
 
@@ -8,19 +8,19 @@ router = APIRouter()
 
 @router.get("", response_model=list[Job])
 def list_jobs() -> list[Job]:
-    return store.jobs
+    return list(store.jobs.values())
 
 
 @router.get("/{job_id}", response_model=Job)
 def get_job(job_id: int) -> Job:
-    for job in store.jobs:
-        if job.id == job_id:
-            return job
-    raise HTTPException(status_code=404, detail="Job not found")
+    job = store.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 
 @router.post("", response_model=Job, status_code=201)
 def create_job(payload: JobCreate) -> Job:
     job = Job(id=store.next_job_id(), **payload.model_dump())
-    store.jobs.append(job)
+    store.add_job(job)
     return job
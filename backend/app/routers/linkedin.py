@@ -5,7 +5,7 @@ from fastapi.responses import RedirectResponse
 from pydantic import BaseModel
 
 from app.core.config import settings
-from app.services.linkedin_client import LinkedInAuthRequiredError, linkedin_resume_client
+from app.services.linkedin_client import LinkedInAuthRequiredError, get_linkedin_resume_client
 
 router = APIRouter()
 
@@ -15,22 +15,22 @@ class LinkedInConnectionStatus(BaseModel):
 
 
 def _app_base_url(request: Request) -> str:
-    return str(request.base_url).rstrip("/")
+    return settings.frontend_base_url or str(request.base_url).rstrip("/")
 
 
 def _callback_url(request: Request) -> str:
-    return f"{_app_base_url(request)}{settings.api_v1_prefix}/linkedin/oauth/callback"
+    return str(request.url_for("linkedin_oauth_callback"))
 
 
 @router.get("/status", response_model=LinkedInConnectionStatus)
 def linkedin_status() -> LinkedInConnectionStatus:
-    return LinkedInConnectionStatus(connected=linkedin_resume_client.is_connected())
+    return LinkedInConnectionStatus(connected=get_linkedin_resume_client().is_connected())
 
 
-@router.get("/oauth/start")
+@router.get("/oauth/start", name="linkedin_oauth_start")
 def linkedin_oauth_start(request: Request) -> RedirectResponse:
     try:
-        auth_url = linkedin_resume_client.start_browser_oauth(
+        auth_url = get_linkedin_resume_client().start_browser_oauth(
             redirect_uri=_callback_url(request),
         )
     except LinkedInAuthRequiredError as exc:
@@ -40,8 +40,8 @@ def linkedin_oauth_start(request: Request) -> RedirectResponse:
     return RedirectResponse(url=auth_url, status_code=302)
 
 
-@router.get("/oauth/callback")
-def linkedin_oauth_callback(
+@router.get("/oauth/callback", name="linkedin_oauth_callback")
+async def linkedin_oauth_callback(
     request: Request,
     state: str | None = None,
     code: str | None = None,
@@ -62,7 +62,7 @@ def linkedin_oauth_callback(
         )
 
     try:
-        linkedin_resume_client.finish_browser_oauth(
+        await get_linkedin_resume_client().afinish_browser_oauth(
             state=state,
             code=code,
             redirect_uri=_callback_url(request),
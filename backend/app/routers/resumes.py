@@ -1,36 +1,41 @@
+import asyncio
+import hashlib
+import re
 from email.utils import parseaddr
 
 from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile
 
 from app.models import CombinedImportResponse, GmailImportResponse, MatchResult, Resume, ResumeCreate
-from app.services.gmail_client import GmailAuthRequiredError, gmail_resume_client
-from app.services.linkedin_client import LinkedInAuthRequiredError, linkedin_resume_client
+from app.services.gmail_client import GmailAuthRequiredError, get_gmail_resume_client
+from app.services.linkedin_client import LinkedInAuthRequiredError, get_linkedin_resume_client
 from app.services.matcher import matcher
-from app.services.resume_parser import extract_text_from_bytes, extract_text_from_upload
+from app.services.resume_parser import extract_text_from_upload, submit_text_extraction
 from app.store import store
 
 router = APIRouter()
 
+_SKILL_SPLIT = re.compile(r"\s*,\s*")
+_NAME_SEP = re.compile(r"[._]")
+
 
 def _parse_skill_csv(csv_value: str | None) -> list[str]:
     if not csv_value:
         return []
-    return [skill.strip() for skill in csv_value.split(",") if skill.strip()]
+    return [skill for skill in _SKILL_SPLIT.split(csv_value.strip()) if skill]
 
 
-def _text_fingerprint(text: str) -> str:
-    return " ".join(text.lower().split())[:500]
+def _text_fingerprint(text: str) -> int:
+    normalized = " ".join(text.lower().split())[:500]
+    digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
 
 
-def _is_duplicate_resume(candidate_name: str, text: str) -> bool:
-    target_name = candidate_name.strip().lower()
-    target_fingerprint = _text_fingerprint(text)
-    for existing in store.resumes:
-        if existing.candidate_name.strip().lower() != target_name:
-            continue
-        if _text_fingerprint(existing.text) == target_fingerprint:
-            return True
-    return False
+def _dedup_key(candidate_name: str, text: str) -> tuple[str, int]:
+    return candidate_name.strip().lower(), _text_fingerprint(text)
+
+
+def _is_duplicate_key(dedup_key: tuple[str, int]) -> bool:
+    return dedup_key in store.resume_fingerprints
 
 
 def _infer_candidate_name(sender: str, filename: str) -> str:
@@ -40,20 +45,28 @@ def _infer_candidate_name(sender: str, filename: str) -> str:
 
     if email_address:
         local_part = email_address.split("@", 1)[0]
-        return local_part.replace(".", " ").replace("_", " ").strip().title()
+        return _NAME_SEP.sub(" ", local_part).strip().title()
 
     base_name = (filename or "Unknown Candidate").rsplit(".", 1)[0]
     return base_name.replace("_", " ").strip() or "Unknown Candidate"
 
 
-def _store_resume(candidate_name: str, text: str, skills: list[str]) -> Resume:
+def _store_resume(
+    candidate_name: str,
+    text: str,
+    skills: list[str],
+    dedup_key: tuple[str, int] | None = None,
+) -> Resume:
+    if dedup_key is None:
+        dedup_key = _dedup_key(candidate_name, text)
     resume = Resume(
         id=store.next_resume_id(),
         candidate_name=candidate_name,
         text=text,
         skills=skills,
     )
-    store.resumes.append(resume)
+    store.add_resume(resume)
+    store.resume_fingerprints.add(dedup_key)
     return resume
 
 
@@ -66,27 +79,40 @@ def _import_from_gmail_attachments(
     skipped_count = 0
     errors: list[str] = []
 
-    for attachment in gmail_resume_client.iter_recent_resume_attachments(
-        max_messages=max_messages,
-        query=query,
-        label=label,
-    ):
-        candidate_name = _infer_candidate_name(attachment.sender, attachment.filename)
-        try:
-            text = extract_text_from_bytes(
+    # PDF/DOCX parsing is CPU-bound and independent per file, so fan it out to the
+    # parser pool and only run dedup and storage back on this thread, in mail order.
+    pending = [
+        (
+            attachment,
+            submit_text_extraction(
                 raw=attachment.raw_bytes,
                 filename=attachment.filename,
                 content_type=attachment.mime_type,
-            )
+            ),
+        )
+        for attachment in get_gmail_resume_client().iter_recent_resume_attachments(
+            max_messages=max_messages,
+            query=query,
+            label=label,
+        )
+    ]
+
+    for attachment, extraction in pending:
+        candidate_name = _infer_candidate_name(attachment.sender, attachment.filename)
+        try:
+            text = extraction.result()
         except ValueError as exc:
             errors.append(f"{attachment.filename}: {exc}")
             continue
 
-        if _is_duplicate_resume(candidate_name=candidate_name, text=text):
+        dedup_key = _dedup_key(candidate_name, text)
+        if _is_duplicate_key(dedup_key):
             skipped_count += 1
             continue
 
-        imported_resumes.append(_store_resume(candidate_name=candidate_name, text=text, skills=[]))
+        imported_resumes.append(
+            _store_resume(candidate_name=candidate_name, text=text, skills=[], dedup_key=dedup_key)
+        )
 
     return GmailImportResponse(
         imported_count=len(imported_resumes),
@@ -96,30 +122,33 @@ def _import_from_gmail_attachments(
     )
 
 
-def _import_from_linkedin_profile(skip_if_duplicate: bool) -> tuple[Resume | None, bool]:
-    profile = linkedin_resume_client.fetch_profile_resume()
+def _import_linkedin_profile(profile: dict, skip_if_duplicate: bool) -> tuple[Resume | None, bool]:
     candidate_name = profile["candidate_name"]
     text = profile["text"]
     skills = profile.get("skills", [])
 
-    if _is_duplicate_resume(candidate_name=candidate_name, text=text):
+    dedup_key = _dedup_key(candidate_name, text)
+    if _is_duplicate_key(dedup_key):
         if skip_if_duplicate:
             return None, True
         raise HTTPException(status_code=409, detail="LinkedIn profile already imported.")
 
-    return _store_resume(candidate_name=candidate_name, text=text, skills=skills), False
+    resume = _store_resume(candidate_name=candidate_name, text=text, skills=skills, dedup_key=dedup_key)
+    return resume, False
 
 
 @router.get("", response_model=list[Resume])
 def list_resumes() -> list[Resume]:
-    return store.resumes
+    return list(store.resumes.values())
 
 
 @router.post("", response_model=Resume, status_code=201)
 def create_resume(payload: ResumeCreate) -> Resume:
-    resume = Resume(id=store.next_resume_id(), **payload.model_dump())
-    store.resumes.append(resume)
-    return resume
+    return _store_resume(
+        candidate_name=payload.candidate_name,
+        text=payload.text,
+        skills=payload.skills,
+    )
 
 
 @router.post("/upload", response_model=Resume, status_code=201)
@@ -134,24 +163,22 @@ async def upload_resume(
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
     inferred_name = (file.filename or "Unknown Candidate").rsplit(".", 1)[0]
-    resume = Resume(
-        id=store.next_resume_id(),
+    return _store_resume(
         candidate_name=candidate_name or inferred_name,
         text=text,
         skills=_parse_skill_csv(skills),
     )
-    store.resumes.append(resume)
-    return resume
 
 
 @router.post("/import/gmail", response_model=GmailImportResponse)
-def import_resumes_from_gmail(
+async def import_resumes_from_gmail(
     max_messages: int = Query(default=5, ge=1, le=100),
     query: str | None = Query(default=None),
     label: str | None = Query(default=None),
 ) -> GmailImportResponse:
     try:
-        return _import_from_gmail_attachments(
+        return await asyncio.to_thread(
+            _import_from_gmail_attachments,
             max_messages=max_messages,
             query=query,
             label=label,
@@ -163,9 +190,10 @@ def import_resumes_from_gmail(
 
 
 @router.post("/import/linkedin", response_model=Resume, status_code=201)
-def import_resume_from_linkedin() -> Resume:
+async def import_resume_from_linkedin() -> Resume:
     try:
-        resume, _ = _import_from_linkedin_profile(skip_if_duplicate=False)
+        profile = await get_linkedin_resume_client().afetch_profile_resume()
+        resume, _ = _import_linkedin_profile(profile, skip_if_duplicate=False)
     except LinkedInAuthRequiredError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     except Exception as exc:
@@ -176,15 +204,16 @@ def import_resume_from_linkedin() -> Resume:
 
 
 @router.post("/import/combined", response_model=CombinedImportResponse)
-def import_resumes_from_gmail_and_linkedin(
+async def import_resumes_from_gmail_and_linkedin(
     max_messages: int = Query(default=5, ge=1, le=100),
     query: str | None = Query(default=None),
     label: str | None = Query(default=None),
 ) -> CombinedImportResponse:
+    # Both checks touch token files (and Gmail may refresh over HTTPS); keep them off the loop.
     missing_sources: list[str] = []
-    if not gmail_resume_client.is_connected():
+    if not await asyncio.to_thread(get_gmail_resume_client().is_connected):
         missing_sources.append("Gmail")
-    if not linkedin_resume_client.is_connected():
+    if not await asyncio.to_thread(get_linkedin_resume_client().is_connected):
         missing_sources.append("LinkedIn")
     if missing_sources:
         raise HTTPException(
@@ -202,8 +231,12 @@ def import_resumes_from_gmail_and_linkedin(
     gmail_skipped_count = 0
     linkedin_imported_count = 0
 
+    # Fetch the LinkedIn profile while Gmail imports; it is stored afterwards so
+    # Gmail resumes keep the lower ids and LinkedIn dedups against them.
+    linkedin_profile = asyncio.create_task(get_linkedin_resume_client().afetch_profile_resume())
     try:
-        gmail_result = _import_from_gmail_attachments(
+        gmail_result = await asyncio.to_thread(
+            _import_from_gmail_attachments,
             max_messages=max_messages,
             query=query,
             label=label,
@@ -218,7 +251,10 @@ def import_resumes_from_gmail_and_linkedin(
         errors.append(f"Gmail import failed: {exc}")
 
     try:
-        linkedin_resume, linkedin_duplicate = _import_from_linkedin_profile(skip_if_duplicate=True)
+        linkedin_resume, linkedin_duplicate = _import_linkedin_profile(
+            await linkedin_profile,
+            skip_if_duplicate=True,
+        )
         if linkedin_resume is not None:
             imported_resumes.append(linkedin_resume)
             linkedin_imported_count = 1
@@ -241,28 +277,30 @@ def import_resumes_from_gmail_and_linkedin(
 
 
 @router.post("/match/{job_id}", response_model=list[MatchResult])
-def match_resumes_to_job(job_id: int) -> list[MatchResult]:
-    selected_job = None
-    for job in store.jobs:
-        if job.id == job_id:
-            selected_job = job
-            break
+def match_resumes_to_job(
+    job_id: int,
+    top_k: int = Query(default=50, ge=1, le=1000),
+) -> list[MatchResult]:
+    selected_job = store.get_job(job_id)
     if selected_job is None:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    results: list[MatchResult] = []
-    for resume in store.resumes:
-        scored = matcher.match(selected_job, resume)
-        results.append(
-            MatchResult(
-                resume_id=resume.id,
-                candidate_name=resume.candidate_name,
-                semantic_score=round(scored.semantic_score, 4),
-                skill_score=round(scored.skill_score, 4),
-                final_score=round(scored.final_score, 4),
-                missing_skills=scored.missing_skills,
-            )
+    ranked = matcher.rank(
+        selected_job,
+        list(store.resumes.values()),
+        top_k=top_k,
+        embedding_cache=store.resume_vectors,
+        corpus_jobs=list(store.jobs.values()),
+    )
+    results = [
+        MatchResult(
+            resume_id=resume.id,
+            candidate_name=resume.candidate_name,
+            semantic_score=round(scored.semantic_score, 4),
+            skill_score=round(scored.skill_score, 4),
+            final_score=round(scored.final_score, 4),
+            missing_skills=scored.missing_skills,
         )
-
-    results.sort(key=lambda item: item.final_score, reverse=True)
+        for resume, scored in ranked
+    ]
     return results
@@ -1,12 +1,12 @@
 from app.core.config import settings
-from app.services.gmail_client import GmailAuthRequiredError, gmail_resume_client
+from app.services.gmail_client import GmailAuthRequiredError, get_gmail_resume_client
 
 
 def main() -> None:
     print("Starting Gmail OAuth authorization...")
     print("A browser window will open. Sign in and grant access.")
     try:
-        gmail_resume_client.authorize_interactive()
+        get_gmail_resume_client().authorize_interactive()
     except GmailAuthRequiredError as exc:
         print(f"Authorization setup error: {exc}")
         raise SystemExit(1) from exc
@@ -1,29 +1,72 @@
 from __future__ import annotations
 
-import base64
+import binascii
 import json
+import threading
 import time
+from collections import OrderedDict, deque
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from datetime import datetime, timezone
 from pathlib import Path
 
+import httplib2
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import Flow
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 
 from app.core.config import settings
+from app.core.files import atomic_write_text
 
 GMAIL_SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
 
+# Refresh access tokens this long before they expire, not after the first failure.
+TOKEN_REFRESH_SLACK_SECONDS = 60
+
+# Gmail allows 100 calls per batch but rate-limits batches above 50, so larger
+# workloads are split into 50-call batches that run concurrently.
+GMAIL_BATCH_SIZE = 50
+
+# Partial-response mask for the structure pass: headers plus the MIME tree without
+# inline body data. Resume mails nest two or three levels deep; the innermost
+# `parts` selector returns whatever lies below in full.
+_PART_FIELDS = "partId,filename,mimeType,body(attachmentId,size)"
+MESSAGE_STRUCTURE_FIELDS = (
+    f"id,payload(headers,{_PART_FIELDS},parts({_PART_FIELDS},parts({_PART_FIELDS},parts)))"
+)
+
+GZIP_USER_AGENT = "ai-resume-matching-engine (gzip)"
+
+_BASE64URL_TO_STD = bytes.maketrans(b"-_", b"+/")
+
 SUPPORTED_ATTACHMENTS = {
     ".txt": "text/plain",
     ".pdf": "application/pdf",
     ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
 }
+_SUPPORTED_EXTENSIONS = tuple(SUPPORTED_ATTACHMENTS)
+_EXTENSION_BY_MIME = {mime: extension for extension, mime in SUPPORTED_ATTACHMENTS.items()}
 
 
-@dataclass
+class _GzipAuthorizedHttp(AuthorizedHttp):
+    """AuthorizedHttp that lets Google gzip batch responses.
+
+    Google only compresses responses when the user agent mentions gzip. Single
+    requests get that from googleapiclient's JSON model, but the batch POST is
+    sent without one, so base64 attachment bodies would come back uncompressed.
+    """
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        headers = dict(headers or {})
+        headers.setdefault("user-agent", GZIP_USER_AGENT)
+        return super().request(uri, method, body=body, headers=headers, **kwargs)
+
+
+@dataclass(slots=True, frozen=True)
 class GmailAttachment:
     message_id: str
     subject: str
@@ -33,6 +76,18 @@ class GmailAttachment:
     raw_bytes: bytes
 
 
+@dataclass(slots=True, frozen=True)
+class _AttachmentPart:
+    message_id: str
+    subject: str
+    sender: str
+    part_id: str | None
+    filename: str
+    mime_type: str
+    data: str | None
+    attachment_id: str | None
+
+
 @dataclass
 class PendingOAuthState:
     state: str
@@ -48,8 +103,13 @@ class GmailAuthRequiredError(RuntimeError):
 class GmailResumeClient:
     def __init__(self) -> None:
         self._service = None
-        self._pending_states: dict[str, PendingOAuthState] = {}
+        self._pending_states: OrderedDict[str, PendingOAuthState] = OrderedDict()
+        self._states_lock = threading.Lock()
         self._oauth_state_ttl_seconds = 900
+        self._client_config_cache: tuple[int, dict] | None = None
+        self._credentials_cache: tuple[int, Credentials] | None = None
+        self._refresh_lock = threading.Lock()
+        self._service_lock = threading.Lock()
 
     def _credentials_path(self) -> Path:
         return Path(settings.gmail_credentials_path)
@@ -59,16 +119,25 @@ class GmailResumeClient:
 
     def _client_config(self) -> dict:
         credentials_path = self._credentials_path()
-        if not credentials_path.exists():
+        try:
+            mtime_ns = credentials_path.stat().st_mtime_ns
+        except FileNotFoundError as exc:
             raise GmailAuthRequiredError(
                 f"Missing Gmail OAuth client file at `{credentials_path}`."
-            )
+            ) from exc
+
+        # Re-parse only when the file changes on disk.
+        cached = self._client_config_cache
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
         try:
-            return json.loads(credentials_path.read_text(encoding="utf-8"))
+            config = json.loads(credentials_path.read_bytes())
         except Exception as exc:
             raise GmailAuthRequiredError(
                 f"Invalid Gmail OAuth client JSON at `{credentials_path}`."
             ) from exc
+        self._client_config_cache = (mtime_ns, config)
+        return config
 
     def config_status(self) -> dict[str, str | bool]:
         credentials_path = self._credentials_path()
@@ -124,7 +193,15 @@ class GmailResumeClient:
         token_path = self._token_path()
         credentials: Credentials | None = None
 
-        if token_path.exists():
+        try:
+            token_mtime_ns: int | None = token_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            token_mtime_ns = None
+
+        cached = self._credentials_cache
+        if token_mtime_ns is not None and cached is not None and cached[0] == token_mtime_ns:
+            credentials = cached[1]
+        elif token_mtime_ns is not None:
             try:
                 credentials = Credentials.from_authorized_user_file(
                     str(token_path),
@@ -135,17 +212,28 @@ class GmailResumeClient:
                     "Gmail token exists but is invalid. "
                     "Reconnect Gmail from the app."
                 ) from exc
-
-        if credentials and credentials.expired and credentials.refresh_token:
-            try:
-                credentials.refresh(Request())
-            except Exception as exc:
-                raise GmailAuthRequiredError(
-                    "Could not refresh Gmail token. "
-                    "Reconnect Gmail from the app."
-                ) from exc
-            token_path.parent.mkdir(parents=True, exist_ok=True)
-            token_path.write_text(credentials.to_json(), encoding="utf-8")
+            self._credentials_cache = (token_mtime_ns, credentials)
+            # A new token on disk (a reconnect, possibly from another worker) gets a
+            # fresh service; in-place refreshes below keep the same credentials object.
+            self._service = None
+
+        if credentials and credentials.refresh_token and self._expires_soon(credentials):
+            with self._refresh_lock:
+                # Another request may have refreshed these credentials while we waited.
+                if self._expires_soon(credentials):
+                    try:
+                        credentials.refresh(Request())
+                    except Exception as exc:
+                        # An early refresh that fails (say, a network blip) must not
+                        # fail calls the current token can still serve.
+                        if credentials.token and self._seconds_to_expiry(credentials) > 0:
+                            return credentials
+                        raise GmailAuthRequiredError(
+                            "Could not refresh Gmail token. "
+                            "Reconnect Gmail from the app."
+                        ) from exc
+                    atomic_write_text(token_path, credentials.to_json())
+                    self._credentials_cache = (token_path.stat().st_mtime_ns, credentials)
             return credentials
 
         if credentials and credentials.valid:
@@ -168,9 +256,21 @@ class GmailResumeClient:
             GMAIL_SCOPES,
         )
         credentials = flow.run_local_server(port=0, open_browser=True)
-        token_path.write_text(credentials.to_json(), encoding="utf-8")
+        atomic_write_text(token_path, credentials.to_json())
         return credentials
 
+    def _seconds_to_expiry(self, credentials: Credentials) -> float:
+        """Seconds until the access token actually expires (infinite when it has no expiry)."""
+        if credentials.expiry is None:
+            return float("inf")
+        # google-auth stores `expiry` as a naive UTC datetime.
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return (credentials.expiry - now).total_seconds()
+
+    def _expires_soon(self, credentials: Credentials) -> bool:
+        """Whether the access token is expired or within the refresh slack of expiring."""
+        return self._seconds_to_expiry(credentials) < TOKEN_REFRESH_SLACK_SECONDS
+
     def is_connected(self) -> bool:
         try:
             credentials = self._load_credentials(allow_interactive=False)
@@ -179,29 +279,41 @@ class GmailResumeClient:
             return False
 
     def _get_service(self):
-        if self._service is None:
-            credentials = self._load_credentials()
-            self._service = build(
-                "gmail",
-                "v1",
-                credentials=credentials,
-                cache_discovery=False,
-            )
-        return self._service
+        credentials = self._load_credentials()
+        service = self._service
+        if service is None:
+            with self._service_lock:
+                service = self._service
+                if service is None:
+                    service = build(
+                        "gmail",
+                        "v1",
+                        http=self._new_http(credentials),
+                        cache_discovery=False,
+                    )
+                    self._service = service
+        return service
 
     def authorize_interactive(self) -> None:
         self._load_credentials(allow_interactive=True)
-        self._service = None
 
     def _cleanup_expired_states(self) -> None:
+        # States are inserted in creation order, so expired ones sit at the head.
         now = time.time()
-        expired = [
-            state_key
-            for state_key, payload in self._pending_states.items()
-            if (now - payload.created_at) > self._oauth_state_ttl_seconds
-        ]
-        for state_key in expired:
-            self._pending_states.pop(state_key, None)
+        with self._states_lock:
+            while self._pending_states:
+                oldest = next(iter(self._pending_states.values()))
+                if (now - oldest.created_at) <= self._oauth_state_ttl_seconds:
+                    break
+                self._pending_states.popitem(last=False)
+
+    def _get_state(self, state: str) -> PendingOAuthState | None:
+        with self._states_lock:
+            return self._pending_states.get(state)
+
+    def _pop_state(self, state: str) -> None:
+        with self._states_lock:
+            self._pending_states.pop(state, None)
 
     def start_browser_oauth(self, redirect_uri: str, next_provider: str | None = None) -> str:
         if not self._is_web_oauth_client():
@@ -223,21 +335,22 @@ class GmailResumeClient:
             include_granted_scopes="true",
             prompt="consent",
         )
-        self._pending_states[state] = PendingOAuthState(
-            state=state,
-            redirect_uri=redirect_uri,
-            created_at=time.time(),
-            next_provider=next_provider,
-        )
+        with self._states_lock:
+            self._pending_states[state] = PendingOAuthState(
+                state=state,
+                redirect_uri=redirect_uri,
+                created_at=time.time(),
+                next_provider=next_provider,
+            )
         return auth_url
 
     def finish_browser_oauth(self, state: str, code: str, redirect_uri: str) -> str | None:
         self._cleanup_expired_states()
-        pending = self._pending_states.get(state)
+        pending = self._get_state(state)
         if pending is None:
             raise GmailAuthRequiredError("OAuth session expired. Click `Connect Gmail` again.")
         if pending.redirect_uri != redirect_uri:
-            self._pending_states.pop(state, None)
+            self._pop_state(state)
             raise GmailAuthRequiredError("OAuth redirect mismatch. Start Gmail connection again.")
 
         flow = Flow.from_client_config(
@@ -251,12 +364,9 @@ class GmailResumeClient:
         except Exception as exc:
             raise GmailAuthRequiredError("Could not complete Gmail authorization.") from exc
 
-        token_path = self._token_path()
-        token_path.parent.mkdir(parents=True, exist_ok=True)
-        token_path.write_text(flow.credentials.to_json(), encoding="utf-8")
+        atomic_write_text(self._token_path(), flow.credentials.to_json())
         next_provider = pending.next_provider
-        self._pending_states.pop(state, None)
-        self._service = None
+        self._pop_state(state)
         return next_provider
 
     def _build_query(self, extra_query: str | None, label: str | None) -> str:
@@ -293,7 +403,7 @@ class GmailResumeClient:
         max_messages: int = 20,
         query: str | None = None,
         label: str | None = None,
-    ):
+    ) -> Iterator[GmailAttachment]:
         service = self._get_service()
         search_query = self._build_query(extra_query=query, label=label)
 
@@ -304,68 +414,198 @@ class GmailResumeClient:
                 userId="me",
                 q=search_query,
                 maxResults=max_messages,
+                fields="messages/id",
             )
             .execute()
         )
 
-        messages = message_response.get("messages", [])
-        yielded_attachments = 0
+        message_ids = [message["id"] for message in message_response.get("messages", []) if message.get("id")]
         max_total_attachments = max(1, settings.gmail_max_attachments_per_import)
+        max_attachment_bytes = self._max_attachment_bytes()
+
+        details_by_id = self._execute_batch(
+            service,
+            [
+                (
+                    message_id,
+                    service.users()
+                    .messages()
+                    .get(userId="me", id=message_id, format="full", fields=MESSAGE_STRUCTURE_FIELDS),
+                )
+                for message_id in message_ids
+            ],
+        )
 
-        for message in messages:
-            if yielded_attachments >= max_total_attachments:
-                break
+        candidates: list[_AttachmentPart] = []
+        for message_id in message_ids:
+            payload = details_by_id.get(message_id, {}).get("payload", {})
+            # Headers are only read for messages that turn out to carry an attachment.
+            header_map: dict[str, str] | None = None
+            for part_id, filename, mime_type, data, attachment_id in self._extract_supported_attachments(payload):
+                if header_map is None:
+                    header_map = self._header_map(payload.get("headers", []))
+                candidates.append(
+                    _AttachmentPart(
+                        message_id=message_id,
+                        subject=header_map.get("subject", ""),
+                        sender=header_map.get("from", ""),
+                        part_id=part_id,
+                        filename=filename,
+                        mime_type=mime_type,
+                        data=data,
+                        attachment_id=attachment_id,
+                    )
+                )
 
-            message_id = message.get("id")
-            if not message_id:
-                continue
+        # The cap counts yielded attachments, so bodies are fetched in rounds sized to
+        # the remaining slots; a candidate dropped for size or missing data frees its slot.
+        yielded = 0
+        start = 0
+        while yielded < max_total_attachments and start < len(candidates):
+            window = candidates[start : start + max_total_attachments - yielded]
+            start += len(window)
+            body_payloads = self._fetch_attachment_bodies(service, window)
+
+            for index, candidate in enumerate(window):
+                data = candidate.data
+                if not data and not candidate.attachment_id:
+                    full_payload = body_payloads.get(f"message:{candidate.message_id}", {}).get("payload", {})
+                    inline_part = self._find_part(full_payload, candidate.part_id) or {}
+                    data = (inline_part.get("body") or {}).get("data")
+                attachment_payload = body_payloads.get(f"attachment:{index}")
+                if attachment_payload is not None:
+                    data = attachment_payload.get("data")
+                    attachment_size = attachment_payload.get("size")
+                    if isinstance(attachment_size, int) and attachment_size > max_attachment_bytes:
+                        continue
+
+                if not data:
+                    continue
+                # base64 carries 3 bytes per 4 chars (minus up to 2 padding bytes), so
+                # oversized bodies can be dropped before allocating the decoded copy.
+                if len(data) * 3 // 4 - 2 > max_attachment_bytes:
+                    continue
 
-            details = (
-                service.users()
-                .messages()
-                .get(userId="me", id=message_id, format="full")
-                .execute()
-            )
-            payload = details.get("payload", {})
-            headers = payload.get("headers", [])
-            subject = self._find_header(headers, "Subject")
-            sender = self._find_header(headers, "From")
-
-            payload_attachments = self._extract_supported_attachments(
-                service=service,
-                message_id=message_id,
-                payload=payload,
-            )
-            for item in payload_attachments:
-                if yielded_attachments >= max_total_attachments:
-                    break
-                yielded_attachments += 1
+                raw = self._decode_base64_url(data)
+                if len(raw) > max_attachment_bytes:
+                    continue
+
+                yielded += 1
                 yield GmailAttachment(
-                    message_id=message_id,
-                    subject=subject,
-                    sender=sender,
-                    filename=item["filename"],
-                    mime_type=item["mime_type"],
-                    raw_bytes=item["raw_bytes"],
+                    message_id=candidate.message_id,
+                    subject=candidate.subject,
+                    sender=candidate.sender,
+                    filename=candidate.filename,
+                    mime_type=candidate.mime_type,
+                    raw_bytes=raw,
                 )
 
-    def _extract_supported_attachments(
+    def _fetch_attachment_bodies(self, service, candidates: list[_AttachmentPart]) -> dict[str, dict]:
+        """Fetch attachment bytes, plus the full message for parts whose data was inline.
+
+        The structure pass masks out inline bodies, so both go out in one batched round trip.
+        """
+        inline_message_ids = sorted(
+            {
+                candidate.message_id
+                for candidate in candidates
+                if not candidate.data and not candidate.attachment_id
+            }
+        )
+        return self._execute_batch(
+            service,
+            [
+                (
+                    f"attachment:{index}",
+                    service.users()
+                    .messages()
+                    .attachments()
+                    .get(
+                        userId="me",
+                        messageId=candidate.message_id,
+                        id=candidate.attachment_id,
+                        fields="data,size",
+                    ),
+                )
+                for index, candidate in enumerate(candidates)
+                if not candidate.data and candidate.attachment_id
+            ]
+            + [
+                (
+                    f"message:{message_id}",
+                    service.users().messages().get(userId="me", id=message_id, format="full", fields="payload"),
+                )
+                for message_id in inline_message_ids
+            ],
+        )
+
+    def _execute_batch(self, service, requests: list[tuple[str, object]]) -> dict[str, dict]:
+        """Execute Gmail API requests through batch HTTP calls, keyed by request id.
+
+        Batches beyond the first run concurrently, each on its own HTTP connection.
+        """
+        chunks = [
+            requests[start : start + GMAIL_BATCH_SIZE]
+            for start in range(0, len(requests), GMAIL_BATCH_SIZE)
+        ]
+        if len(chunks) <= 1:
+            return self._execute_batch_chunk(service, chunks[0]) if chunks else {}
+
+        responses: dict[str, dict] = {}
+        workers = min(len(chunks), max(1, settings.gmail_fetch_workers))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for chunk_responses in executor.map(
+                lambda chunk: self._execute_batch_chunk(service, chunk, http=self._new_http()),
+                chunks,
+            ):
+                responses.update(chunk_responses)
+        return responses
+
+    def _execute_batch_chunk(
         self,
         service,
-        message_id: str,
-        payload: dict,
-    ) -> list[dict]:
-        attachments: list[dict] = []
-        stack = [payload]
+        requests: list[tuple[str, object]],
+        http=None,
+    ) -> dict[str, dict]:
+        responses: dict[str, dict] = {}
+        failures: list[Exception] = []
+
+        def on_response(request_id: str, response: dict, exception: Exception | None) -> None:
+            if exception is not None:
+                failures.append(exception)
+            else:
+                responses[request_id] = response
+
+        batch = service.new_batch_http_request(callback=on_response)
+        for request_id, request in requests:
+            batch.add(request, request_id=request_id)
+        batch.execute(http=http)
+        if failures:
+            raise failures[0]
+        return responses
+
+    def _new_http(self, credentials: Credentials | None = None) -> AuthorizedHttp:
+        # httplib2 connections are not thread-safe, so each worker gets its own.
+        return _GzipAuthorizedHttp(credentials or self._load_credentials(), http=httplib2.Http())
+
+    def _extract_supported_attachments(
+        self, payload: dict
+    ) -> Iterator[tuple[str | None, str, str, str | None, str | None]]:
+        """Yield (part_id, filename, mime_type, data, attachment_id) per supported part."""
+        stack = deque((payload,))
         max_attachment_bytes = self._max_attachment_bytes()
 
         while stack:
             part = stack.pop()
-            child_parts = part.get("parts") or []
+            child_parts = part.get("parts")
             if child_parts:
                 stack.extend(child_parts)
 
-            filename = part.get("filename") or ""
+            # Multipart containers and inline bodies carry no filename; skip them
+            # before touching the MIME type or body.
+            filename = part.get("filename")
+            if not filename:
+                continue
             mime_type = part.get("mimeType") or "application/octet-stream"
             if not self._is_supported_attachment(filename=filename, mime_type=mime_type):
                 continue
@@ -377,61 +617,51 @@ class GmailResumeClient:
             if isinstance(body_size, int) and body_size > max_attachment_bytes:
                 continue
 
-            if not data and attachment_id:
-                attachment_payload = (
-                    service.users()
-                    .messages()
-                    .attachments()
-                    .get(
-                        userId="me",
-                        messageId=message_id,
-                        id=attachment_id,
-                    )
-                    .execute()
-                )
-                data = attachment_payload.get("data")
-                attachment_size = attachment_payload.get("size")
-                if isinstance(attachment_size, int) and attachment_size > max_attachment_bytes:
-                    continue
-
-            if not data:
-                continue
-
-            raw = self._decode_base64_url(data)
-            if len(raw) > max_attachment_bytes:
-                continue
-
-            attachments.append(
-                {
-                    "filename": filename,
-                    "mime_type": mime_type,
-                    "raw_bytes": raw,
-                }
-            )
+            yield part.get("partId"), filename, mime_type, data, attachment_id
 
-        return attachments
+    def _find_part(self, payload: dict, part_id: str | None) -> dict | None:
+        stack = [payload]
+        while stack:
+            part = stack.pop()
+            if part.get("partId") == part_id:
+                return part
+            stack.extend(part.get("parts") or [])
+        return None
 
     def _is_supported_attachment(self, filename: str, mime_type: str) -> bool:
         if not filename:
             return False
         lower_filename = filename.lower()
-        lower_mime = mime_type.lower()
-        for extension, canonical_mime in SUPPORTED_ATTACHMENTS.items():
-            if lower_filename.endswith(extension):
-                return True
-            if lower_mime == canonical_mime and extension in lower_filename:
-                return True
-        return False
-
-    def _find_header(self, headers: list[dict], key: str) -> str:
+        if lower_filename.endswith(_SUPPORTED_EXTENSIONS):
+            return True
+        # A matching MIME type still needs its own extension somewhere in the name.
+        extension = _EXTENSION_BY_MIME.get(mime_type.lower())
+        return extension is not None and extension in lower_filename
+
+    def _header_map(self, headers: list[dict]) -> dict[str, str]:
+        # Keep the first occurrence of each name, as a linear header search would.
+        header_map: dict[str, str] = {}
         for item in headers:
-            if item.get("name", "").lower() == key.lower():
-                return item.get("value", "")
-        return ""
+            name = item.get("name")
+            if name:
+                header_map.setdefault(name.lower(), item.get("value", ""))
+        return header_map
 
     def _decode_base64_url(self, encoded: str) -> bytes:
-        padded = encoded + ("=" * (-len(encoded) % 4))
-        return base64.urlsafe_b64decode(padded.encode("utf-8"))
+        # Non-strict a2b_base64 ignores surplus padding, so a fixed "==" suffix
+        # covers every unpadded length without computing it.
+        return binascii.a2b_base64(encoded.encode("ascii").translate(_BASE64URL_TO_STD) + b"==")
+
+
+_gmail_resume_client: GmailResumeClient | None = None
+_gmail_resume_client_lock = threading.Lock()
 
 
-gmail_resume_client = GmailResumeClient()
+def get_gmail_resume_client() -> GmailResumeClient:
+    """Return the process-wide Gmail client, creating it on first use."""
+    global _gmail_resume_client
+    if _gmail_resume_client is None:
+        with _gmail_resume_client_lock:
+            if _gmail_resume_client is None:
+                _gmail_resume_client = GmailResumeClient()
+    return _gmail_resume_client
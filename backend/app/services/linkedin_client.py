@@ -1,20 +1,27 @@
 from __future__ import annotations
 
-import json
+import asyncio
 import secrets
+import threading
 import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from pathlib import Path
-from urllib.error import HTTPError, URLError
 from urllib.parse import urlencode
-from urllib.request import Request, urlopen
+
+import httpx
+import orjson
 
 from app.core.config import settings
+from app.core.files import atomic_write_bytes
 
 LINKEDIN_AUTH_URL = "https://www.linkedin.com/oauth/v2/authorization"
 LINKEDIN_TOKEN_URL = "https://www.linkedin.com/oauth/v2/accessToken"
 LINKEDIN_USERINFO_URL = "https://api.linkedin.com/v2/userinfo"
 
+# Treat tokens this close to expiry as expired so calls never race the deadline.
+TOKEN_EXPIRY_SLACK_SECONDS = 60
+
 
 @dataclass
 class PendingLinkedInState:
@@ -29,21 +36,33 @@ class LinkedInAuthRequiredError(RuntimeError):
 
 class LinkedInResumeClient:
     def __init__(self) -> None:
-        self._pending_states: dict[str, PendingLinkedInState] = {}
+        self._pending_states: OrderedDict[str, PendingLinkedInState] = OrderedDict()
+        self._states_lock = threading.Lock()
         self._oauth_state_ttl_seconds = 900
+        self._token_cache: tuple[int, dict] | None = None
+        # Pooled client so repeat calls reuse the TLS connection (and HTTP/2 where offered).
+        self._async_http = httpx.AsyncClient(http2=True, timeout=20, follow_redirects=True)
 
     def _token_path(self) -> Path:
         return Path(settings.linkedin_token_path)
 
     def _cleanup_expired_states(self) -> None:
+        # States are inserted in creation order, so expired ones sit at the head.
         now = time.time()
-        expired = [
-            state_key
-            for state_key, payload in self._pending_states.items()
-            if (now - payload.created_at) > self._oauth_state_ttl_seconds
-        ]
-        for state_key in expired:
-            self._pending_states.pop(state_key, None)
+        with self._states_lock:
+            while self._pending_states:
+                oldest = next(iter(self._pending_states.values()))
+                if (now - oldest.created_at) <= self._oauth_state_ttl_seconds:
+                    break
+                self._pending_states.popitem(last=False)
+
+    def _get_state(self, state: str) -> PendingLinkedInState | None:
+        with self._states_lock:
+            return self._pending_states.get(state)
+
+    def _pop_state(self, state: str) -> None:
+        with self._states_lock:
+            self._pending_states.pop(state, None)
 
     def _scopes(self) -> str:
         scope_value = settings.linkedin_scopes.strip()
@@ -60,21 +79,31 @@ class LinkedInResumeClient:
 
     def _load_token(self) -> dict:
         token_path = self._token_path()
-        if not token_path.exists():
+        try:
+            mtime_ns = token_path.stat().st_mtime_ns
+        except FileNotFoundError as exc:
             raise LinkedInAuthRequiredError(
                 "LinkedIn is not connected yet. Click `Connect LinkedIn` in the app."
-            )
+            ) from exc
+
+        # Re-parse only when the file changes on disk.
+        cached = self._token_cache
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
         try:
-            return json.loads(token_path.read_text(encoding="utf-8"))
+            token = orjson.loads(token_path.read_bytes())
         except Exception as exc:
             raise LinkedInAuthRequiredError(
                 f"Invalid LinkedIn token file at `{token_path}`. Reconnect LinkedIn."
             ) from exc
+        self._token_cache = (mtime_ns, token)
+        return token
 
     def _access_token(self) -> str:
         token = self._load_token()
         expires_at = token.get("expires_at")
-        if isinstance(expires_at, (int, float)) and time.time() >= float(expires_at):
+        expires_soon = time.time() + TOKEN_EXPIRY_SLACK_SECONDS
+        if isinstance(expires_at, (int, float)) and expires_soon >= float(expires_at):
             raise LinkedInAuthRequiredError(
                 "LinkedIn token expired. Click `Connect LinkedIn` again."
             )
@@ -95,11 +124,12 @@ class LinkedInResumeClient:
         self._cleanup_expired_states()
 
         state = secrets.token_urlsafe(24)
-        self._pending_states[state] = PendingLinkedInState(
-            state=state,
-            redirect_uri=redirect_uri,
-            created_at=time.time(),
-        )
+        with self._states_lock:
+            self._pending_states[state] = PendingLinkedInState(
+                state=state,
+                redirect_uri=redirect_uri,
+                created_at=time.time(),
+            )
         query = urlencode(
             {
                 "response_type": "code",
@@ -111,85 +141,93 @@ class LinkedInResumeClient:
         )
         return f"{LINKEDIN_AUTH_URL}?{query}"
 
-    def finish_browser_oauth(self, state: str, code: str, redirect_uri: str) -> None:
+    def _pending_state(self, state: str, redirect_uri: str) -> PendingLinkedInState:
         self._validate_client_config()
         self._cleanup_expired_states()
 
-        pending = self._pending_states.get(state)
+        pending = self._get_state(state)
         if pending is None:
             raise LinkedInAuthRequiredError("LinkedIn OAuth session expired. Try connecting again.")
         if pending.redirect_uri != redirect_uri:
-            self._pending_states.pop(state, None)
+            self._pop_state(state)
             raise LinkedInAuthRequiredError("LinkedIn OAuth redirect mismatch.")
+        return pending
 
-        payload = urlencode(
-            {
-                "grant_type": "authorization_code",
-                "code": code,
-                "redirect_uri": redirect_uri,
-                "client_id": settings.linkedin_client_id.strip(),
-                "client_secret": settings.linkedin_client_secret.strip(),
-            }
-        ).encode("utf-8")
-        request = Request(
-            LINKEDIN_TOKEN_URL,
-            data=payload,
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-            method="POST",
-        )
+    def _token_form(self, code: str, redirect_uri: str) -> dict[str, str]:
+        return {
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": redirect_uri,
+            "client_id": settings.linkedin_client_id.strip(),
+            "client_secret": settings.linkedin_client_secret.strip(),
+        }
 
-        try:
-            with urlopen(request, timeout=20) as response:
-                body = response.read().decode("utf-8")
-        except HTTPError as exc:
-            detail = exc.read().decode("utf-8", errors="ignore")
-            self._pending_states.pop(state, None)
-            raise LinkedInAuthRequiredError(
-                f"LinkedIn token exchange failed ({exc.code}): {detail or exc.reason}"
-            ) from exc
-        except URLError as exc:
-            self._pending_states.pop(state, None)
-            raise LinkedInAuthRequiredError("LinkedIn token exchange failed due to network issue.") from exc
+    def _token_exchange_error(self, state: str, exc: httpx.HTTPError) -> LinkedInAuthRequiredError:
+        self._pop_state(state)
+        if isinstance(exc, httpx.HTTPStatusError):
+            detail = exc.response.content.decode("utf-8", errors="ignore")
+            return LinkedInAuthRequiredError(
+                f"LinkedIn token exchange failed ({exc.response.status_code}): "
+                f"{detail or exc.response.reason_phrase}"
+            )
+        return LinkedInAuthRequiredError("LinkedIn token exchange failed due to network issue.")
 
-        token_data = json.loads(body)
+    def _save_token(self, state: str, response: httpx.Response) -> None:
+        token_data = orjson.loads(response.content)
         access_token = token_data.get("access_token")
         expires_in = token_data.get("expires_in")
         if not isinstance(access_token, str) or not access_token:
-            self._pending_states.pop(state, None)
+            self._pop_state(state)
             raise LinkedInAuthRequiredError("LinkedIn token response did not include access token.")
 
         now = time.time()
         expires_seconds = int(expires_in) if isinstance(expires_in, (int, float, str)) else 3600
-        token_payload = {
-            **token_data,
-            "created_at": now,
-            "expires_at": now + max(60, expires_seconds - 60),
-        }
+        # token_data is freshly parsed and owned here, so annotate it in place.
+        token_data["created_at"] = now
+        token_data["expires_at"] = now + max(60, expires_seconds - 60)
 
-        token_path = self._token_path()
-        token_path.parent.mkdir(parents=True, exist_ok=True)
-        token_path.write_text(json.dumps(token_payload), encoding="utf-8")
-        self._pending_states.pop(state, None)
-
-    def fetch_profile_resume(self) -> dict:
-        access_token = self._access_token()
-        request = Request(
-            LINKEDIN_USERINFO_URL,
-            headers={"Authorization": f"Bearer {access_token}"},
-            method="GET",
-        )
+        atomic_write_bytes(self._token_path(), orjson.dumps(token_data))
+        self._pop_state(state)
 
+    async def afinish_browser_oauth(self, state: str, code: str, redirect_uri: str) -> None:
+        self._pending_state(state, redirect_uri)
         try:
-            with urlopen(request, timeout=20) as response:
-                payload = json.loads(response.read().decode("utf-8"))
-        except HTTPError as exc:
-            detail = exc.read().decode("utf-8", errors="ignore")
-            raise LinkedInAuthRequiredError(
-                f"LinkedIn profile request failed ({exc.code}): {detail or exc.reason}"
-            ) from exc
-        except URLError as exc:
-            raise LinkedInAuthRequiredError("Could not reach LinkedIn profile endpoint.") from exc
+            response = await self._async_http.post(
+                LINKEDIN_TOKEN_URL,
+                data=self._token_form(code, redirect_uri),
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            raise self._token_exchange_error(state, exc) from exc
+        # Token persistence touches disk; keep it off the event loop.
+        await asyncio.to_thread(self._save_token, state, response)
+
+    def _profile_error(self, exc: httpx.HTTPError) -> LinkedInAuthRequiredError:
+        if isinstance(exc, httpx.HTTPStatusError):
+            detail = exc.response.content.decode("utf-8", errors="ignore")
+            return LinkedInAuthRequiredError(
+                f"LinkedIn profile request failed ({exc.response.status_code}): "
+                f"{detail or exc.response.reason_phrase}"
+            )
+        return LinkedInAuthRequiredError("Could not reach LinkedIn profile endpoint.")
+
+    async def afetch_profile_resume(self) -> dict:
+        # Reading the token may hit the disk; keep it off the event loop.
+        access_token = await asyncio.to_thread(self._access_token)
+        try:
+            response = await self._async_http.get(
+                LINKEDIN_USERINFO_URL,
+                headers={"Authorization": f"Bearer {access_token}"},
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            raise self._profile_error(exc) from exc
+        return self._profile_resume(orjson.loads(response.content))
+
+    async def aclose(self) -> None:
+        await self._async_http.aclose()
 
+    def _profile_resume(self, payload: dict) -> dict:
         full_name = str(payload.get("name") or "").strip()
         if not full_name:
             given_name = str(payload.get("given_name") or "").strip()
@@ -214,4 +252,24 @@ class LinkedInResumeClient:
         }
 
 
-linkedin_resume_client = LinkedInResumeClient()
+_linkedin_resume_client: LinkedInResumeClient | None = None
+_linkedin_resume_client_lock = threading.Lock()
+
+
+def get_linkedin_resume_client() -> LinkedInResumeClient:
+    """Return the process-wide LinkedIn client, creating it on first use."""
+    global _linkedin_resume_client
+    if _linkedin_resume_client is None:
+        with _linkedin_resume_client_lock:
+            if _linkedin_resume_client is None:
+                _linkedin_resume_client = LinkedInResumeClient()
+    return _linkedin_resume_client
+
+
+async def aclose_linkedin_resume_client() -> None:
+    """Close the process-wide LinkedIn client's connection pool, if it was ever created."""
+    global _linkedin_resume_client
+    with _linkedin_resume_client_lock:
+        client, _linkedin_resume_client = _linkedin_resume_client, None
+    if client is not None:
+        await client.aclose()
@@ -1,13 +1,21 @@
 from __future__ import annotations
 
+import hashlib
 from dataclasses import dataclass
+from functools import lru_cache
 
 import numpy as np
+from scipy.sparse import csr_matrix, vstack
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
 from app.core.config import settings
 from app.models import Job, Resume
+from app.store import EmbeddingMatrix, LazyLRUCache
+
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover
+    ahocorasick = None
 
 
 @dataclass
@@ -18,76 +26,230 @@ class MatchScore:
     missing_skills: list[str]
 
 
-def _normalize_skill(value: str) -> str:
-    return value.strip().lower()
+@dataclass
+class JobContext:
+    description: str
+    required_skills: tuple[str, ...]
+    required_skill_set: frozenset[str]
+    embedding: np.ndarray | None
+    skill_automaton: object | None = None
+
+
+@dataclass
+class _TfidfIndex:
+    """TF-IDF vocabulary fitted over a job + resume corpus, with cached L2-normalized rows by resume id."""
+
+    vectorizer: TfidfVectorizer
+    corpus_size: int
+    job_keys: frozenset[bytes]
+    rows: LazyLRUCache[int, csr_matrix]
+
+
+# Below this many required skills, per-skill `in` scans (memchr-backed) beat one
+# Aho-Corasick pass over the resume text.
+_SKILL_AUTOMATON_MIN_SKILLS = 24
+
+# Refit the TF-IDF vocabulary once the ranked corpus outgrows the fitted one by this factor.
+_TFIDF_REFIT_GROWTH = 1.25
+
+# Quantized rows span [-127, 127]: each row is scaled so its largest component maps to 127.
+_INT8_SCALE = 127
+
+# Rows are widened in blocks this size (384 KB at 384 dimensions) so each block is
+# still in cache when the matrix-vector product reads it.
+_DOT_BLOCK_ROWS = 256
+
+
+def _skill_automaton(skills: tuple[str, ...]):
+    if ahocorasick is None or len(skills) < _SKILL_AUTOMATON_MIN_SKILLS:
+        return None
+    automaton = ahocorasick.Automaton()
+    for skill in skills:
+        automaton.add_word(skill, skill)
+    automaton.make_automaton()
+    return automaton
+
+
+def _text_key(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def _quantize(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Quantize rows to int8 with per-row scales, so `quantized / scale` approximates each row."""
+    # A fixed scale on unit vectors (components mostly under 0.25) would use only
+    # about +-30 of the int8 levels and shift reported scores by up to ~0.01.
+    peaks = np.abs(vectors).max(axis=1)
+    scales = (_INT8_SCALE / np.where(peaks > 0, peaks, 1.0)).astype(np.float32)
+    quantized = np.round(vectors * scales[:, None]).astype(np.int8)
+    return quantized, scales
+
+
+def _quantized_dot(matrix: np.ndarray, scales: np.ndarray, vector: np.ndarray) -> np.ndarray:
+    """Dot products of int8 rows (with their per-row `scales`) against a float `vector`."""
+    # Widen to float32 for a BLAS matrix-vector product; numpy's integer matmul has no
+    # BLAS path. The job vector stays unquantized, so only the rows carry error.
+    query = np.asarray(vector, dtype=np.float32)
+    scores = np.empty(len(matrix), dtype=np.float32)
+    block = np.empty((min(_DOT_BLOCK_ROWS, len(matrix)), matrix.shape[1]), dtype=np.float32)
+    for start in range(0, len(matrix), _DOT_BLOCK_ROWS):
+        rows = matrix[start : start + _DOT_BLOCK_ROWS]
+        widened = block[: len(rows)]
+        np.copyto(widened, rows)
+        np.matmul(widened, query, out=scores[start : start + len(rows)])
+    scores /= scales
+    return scores
+
+
+@lru_cache(maxsize=1)
+def get_transformer():
+    """Return the process-wide sentence-transformer, or None when disabled or unavailable."""
+    if not settings.enable_transformer_embeddings:
+        return None
+    # Use local cache only to avoid long network retries at request time.
+    options: dict = {"local_files_only": True}
+    if settings.embedding_backend == "onnx":
+        # ONNX Runtime skips torch dispatch; the default file is the dynamically
+        # int8-quantized export that uses VNNI instructions where the CPU has them.
+        options["backend"] = "onnx"
+        options["model_kwargs"] = {"file_name": settings.embedding_onnx_file_name}
+    try:
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(settings.embedding_model_name, **options)
+    except Exception:  # pragma: no cover
+        return None
+
+
+def warm_up_transformer() -> None:
+    """Load the transformer and run a tiny batch so the first request skips that setup."""
+    transformer = get_transformer()
+    if transformer is not None:
+        transformer.encode(["warmup"] * 2, batch_size=2, normalize_embeddings=True)
 
 
 class JobMatcher:
     def __init__(self) -> None:
-        self._transformer = None
-        self._transformer_failed = False
-        self._tfidf_vectorizer = TfidfVectorizer(stop_words="english")
-
-    def _load_transformer(self):
-        if self._transformer is not None:
-            return self._transformer
-        if self._transformer_failed or not settings.enable_transformer_embeddings:
-            return None
-        try:
-            from sentence_transformers import SentenceTransformer
+        self._tfidf_index: _TfidfIndex | None = None
+        # Unit-norm float32 embeddings keyed by the SHA-256 of the encoded text.
+        self._text_embeddings: LazyLRUCache[bytes, np.ndarray] = LazyLRUCache(
+            settings.text_embedding_cache_size
+        )
 
-            # Use local cache only to avoid long network retries at request time.
-            self._transformer = SentenceTransformer(
-                settings.embedding_model_name,
-                local_files_only=True,
+    def _embed(self, texts: list[str]) -> np.ndarray:
+        """Return unit-norm embeddings for `texts`, encoding only texts not seen before."""
+        keys = [_text_key(text) for text in texts]
+        vectors = [self._text_embeddings.get(key) for key in keys]
+        missing: dict[bytes, list[int]] = {}
+        for index, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[index], []).append(index)
+        if missing:
+            encoded = get_transformer().encode(
+                [texts[indexes[0]] for indexes in missing.values()],
+                batch_size=32,
+                normalize_embeddings=True,
             )
-        except Exception:  # pragma: no cover
-            self._transformer_failed = True
-            self._transformer = None
-        return self._transformer
+            for (key, indexes), vector in zip(missing.items(), np.asarray(encoded, dtype=np.float32)):
+                self._text_embeddings[key] = vector
+                for index in indexes:
+                    vectors[index] = vector
+        return np.stack(vectors)
 
-    def semantic_similarity(self, job_text: str, resume_text: str) -> float:
-        transformer = self._load_transformer()
-        if transformer is not None:
-            embeddings = transformer.encode(
-                [job_text, resume_text],
-                normalize_embeddings=True,
+    def _tfidf_scores(
+        self,
+        job_text: str,
+        resumes: list[Resume],
+        corpus_job_texts: list[str] | None = None,
+    ) -> np.ndarray:
+        """Cosine scores of `resumes` against `job_text` over a vocabulary fitted to jobs + resumes."""
+        job_texts = list(dict.fromkeys([job_text, *(corpus_job_texts or [])]))
+        index = self._tfidf_index
+        corpus_size = len(job_texts) + len(resumes)
+        if (
+            index is None
+            # A job outside the fitted corpus would lose every term no fitted document
+            # has, so its scores would depend on which job happened to be fitted first.
+            or _text_key(job_text) not in index.job_keys
+            or corpus_size > index.corpus_size * _TFIDF_REFIT_GROWTH
+        ):
+            vectorizer = TfidfVectorizer(stop_words="english", dtype=np.float32)
+            vectorizer.fit([*job_texts, *(resume.text for resume in resumes)])
+            index = _TfidfIndex(
+                vectorizer=vectorizer,
+                corpus_size=corpus_size,
+                job_keys=frozenset(_text_key(text) for text in job_texts),
+                rows=LazyLRUCache(settings.resume_embedding_cache_size),
             )
-            score = float(np.dot(embeddings[0], embeddings[1]))
-        else:
-            vectors = self._tfidf_vectorizer.fit_transform([job_text, resume_text])
-            score = float(cosine_similarity(vectors[0:1], vectors[1:2])[0][0])
-        return min(max(score, 0.0), 1.0)
+            self._tfidf_index = index
 
-    def skill_overlap(
+        # Gather into a local list: the bounded row cache may evict while it is filled.
+        rows = [index.rows.get(resume.id) for resume in resumes]
+        missing = [position for position, row in enumerate(rows) if row is None]
+        if missing:
+            # Rows are L2-normalized by the vectorizer, so a dot product is the cosine.
+            transformed = index.vectorizer.transform([resumes[position].text for position in missing])
+            for position, row in zip(missing, transformed):
+                rows[position] = row
+                index.rows[resumes[position].id] = row
+        resume_rows = vstack(rows, format="csr")
+        job_row = index.vectorizer.transform([job_text])
+        return (resume_rows @ job_row.T).toarray().ravel()
+
+    def _normalized_skill_overlap(
         self,
-        required_skills: list[str],
-        resume_skills: list[str],
-        resume_text: str,
+        required: list[str] | tuple[str, ...],
+        required_set: frozenset[str],
+        resume_skill_set: set[str] | frozenset[str],
+        resume_text_lower: str,
+        automaton=None,
+        resume_tokens: frozenset[str] = frozenset(),
     ) -> tuple[float, list[str]]:
-        required = [_normalize_skill(skill) for skill in required_skills if skill.strip()]
         if not required:
             return 1.0, []
 
-        resume_skill_set = {_normalize_skill(skill) for skill in resume_skills}
-        resume_text_lower = resume_text.lower()
-        matched = 0
-        missing_skills: list[str] = []
-
-        for skill in required:
-            if skill in resume_skill_set or skill in resume_text_lower:
-                matched += 1
-            else:
-                missing_skills.append(skill)
-
-        return matched / len(required), missing_skills
-
-    def match(self, job: Job, resume: Resume) -> MatchScore:
-        semantic = self.semantic_similarity(job.description, resume.text)
-        skill_score, missing_skills = self.skill_overlap(
-            job.required_skills,
-            resume.skills,
-            resume.text,
+        # Tokens are substrings of the lowercased text, so a hashed hit settles a skill
+        # without scanning; only the leftovers need the substring test.
+        unsettled = required_set.difference(resume_skill_set, resume_tokens)
+        if not unsettled:
+            return 1.0, []
+
+        if automaton is not None:
+            # One pass over the text finds every (possibly overlapping) skill occurrence.
+            unsettled = unsettled.difference(skill for _, skill in automaton.iter(resume_text_lower))
+        else:
+            unsettled = {skill for skill in unsettled if skill not in resume_text_lower}
+        # Walk `required` so missing skills keep their order (and any duplicates).
+        missing_skills = [skill for skill in required if skill in unsettled]
+        return (len(required) - len(missing_skills)) / len(required), missing_skills
+
+    def encode_job(self, job: Job) -> JobContext:
+        """Compute everything about `job` that is shared across the resumes it is matched against."""
+        transformer = get_transformer()
+        embedding = None
+        if transformer is not None:
+            embedding = self._embed([job.description])[0]
+        required_skills = job.normalized_required_skills
+        return JobContext(
+            description=job.description,
+            required_skills=required_skills,
+            required_skill_set=frozenset(required_skills),
+            embedding=embedding,
+            skill_automaton=_skill_automaton(required_skills),
+        )
+
+    def match_with(
+        self,
+        context: JobContext,
+        resume: Resume,
+        semantic: float,
+    ) -> MatchScore:
+        skill_score, missing_skills = self._normalized_skill_overlap(
+            context.required_skills,
+            context.required_skill_set,
+            resume.normalized_skills,
+            resume.text_lower,
+            context.skill_automaton,
+            resume.text_tokens,
         )
         final = (0.75 * semantic) + (0.25 * skill_score)
         return MatchScore(
@@ -97,5 +259,116 @@ class JobMatcher:
             missing_skills=missing_skills,
         )
 
+    def resume_embeddings(
+        self,
+        resumes: list[Resume],
+        cache: EmbeddingMatrix | None = None,
+    ) -> tuple[np.ndarray, np.ndarray] | None:
+        """Return int8 `(R, d)` resume embeddings and their row scales, encoding only those missing from `cache`."""
+        transformer = get_transformer()
+        if transformer is None:
+            return None
+        if cache is None:
+            cache = EmbeddingMatrix(max(1, len(resumes)))
+        ids = [resume.id for resume in resumes]
+        embeddings, scales, missing = cache.take(ids)
+        if len(missing):
+            # One call for every missing resume: `encode` sorts its inputs by length
+            # before batching (and restores the order), so batches pad very little.
+            encoded = transformer.encode(
+                [resumes[position].text for position in missing],
+                batch_size=32,
+                normalize_embeddings=True,
+            )
+            quantized, encoded_scales = _quantize(np.asarray(encoded, dtype=np.float32))
+            if embeddings is None:
+                embeddings = np.empty((len(ids), quantized.shape[1]), dtype=np.int8)
+                scales = np.empty(len(ids), dtype=np.float32)
+            embeddings[missing] = quantized
+            scales[missing] = encoded_scales
+            cache.add(
+                {
+                    ids[position]: (row, float(scale))
+                    for position, row, scale in zip(missing, quantized, encoded_scales)
+                }
+            )
+        return embeddings, scales
+
+    def _semantic_scores(
+        self,
+        context: JobContext,
+        resumes: list[Resume],
+        embedding_cache: EmbeddingMatrix | None,
+        corpus_jobs: list[Job] | None = None,
+    ) -> np.ndarray:
+        if context.embedding is None:
+            raw_scores = self._tfidf_scores(
+                context.description,
+                resumes,
+                [corpus_job.description for corpus_job in corpus_jobs or []],
+            )
+        else:
+            # A job embedding implies a loaded transformer, so resume embeddings exist too.
+            resume_embeddings = self.resume_embeddings(resumes, embedding_cache)
+            raw_scores = _quantized_dot(*resume_embeddings, context.embedding)
+        return np.clip(raw_scores, 0.0, 1.0)
+
+    def rank(
+        self,
+        job: Job,
+        resumes: list[Resume],
+        top_k: int | None = None,
+        embedding_cache: EmbeddingMatrix | None = None,
+        corpus_jobs: list[Job] | None = None,
+    ) -> list[tuple[Resume, MatchScore]]:
+        """Return the `top_k` best matches for `job` (all of them when `top_k` is None), best first.
+
+        Scores are computed as arrays; `MatchScore` objects are only built for the returned rows.
+        `corpus_jobs` are the other known jobs, fitted into the TF-IDF fallback's vocabulary
+        so its scores do not depend on which job was matched first.
+        """
+        if not resumes:
+            return []
+        context = self.encode_job(job)
+        semantic_scores = self._semantic_scores(context, resumes, embedding_cache, corpus_jobs)
+        skill_scores = np.fromiter(
+            (
+                self._normalized_skill_overlap(
+                    context.required_skills,
+                    context.required_skill_set,
+                    resume.normalized_skills,
+                    resume.text_lower,
+                    context.skill_automaton,
+                    resume.text_tokens,
+                )[0]
+                for resume in resumes
+            ),
+            dtype=np.float64,
+            count=len(resumes),
+        )
+        final_scores = (0.75 * semantic_scores.astype(np.float64)) + (0.25 * skill_scores)
+        # Rank on the rounded score the API reports so ties keep insertion order.
+        ranking_scores = np.round(final_scores, 4)
+
+        candidates = np.arange(len(resumes))
+        if top_k is not None and top_k < len(resumes):
+            # The partition picks an arbitrary subset of rows tied at the cutoff, so widen
+            # to every row scoring at least the k-th score before the stable sort.
+            cutoff = ranking_scores[np.argpartition(-ranking_scores, top_k - 1)[top_k - 1]]
+            candidates = np.flatnonzero(ranking_scores >= cutoff)
+        order = candidates[np.lexsort((candidates, -ranking_scores[candidates]))][:top_k]
+
+        return [
+            (
+                resumes[index],
+                self.match_with(
+                    context,
+                    resumes[index],
+                    semantic=float(semantic_scores[index]),
+                ),
+            )
+            for index in order
+        ]
+
 
 matcher = JobMatcher()
@@ -1,19 +1,38 @@
-from io import BytesIO
+import asyncio
+import codecs
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO, StringIO
+from typing import BinaryIO
 
 import pdfplumber
+import pypdfium2 as pdfium
 from docx import Document
 from fastapi import UploadFile
 
 from app.core.config import settings
 
+_PDFIUM_LOCK = threading.Lock()
 
-async def extract_text_from_upload(file: UploadFile) -> str:
-    raw = await file.read()
-    if not raw:
-        raise ValueError("Uploaded file is empty.")
 
-    return extract_text_from_bytes(
-        raw=raw,
+# A readable, seekable binary source: raw bytes or an (already spooled) file object.
+ParseSource = bytes | BinaryIO
+
+_TEXT_READ_CHUNK_BYTES = 1 << 20
+
+# Set in parser pool workers, which must not fan work back out to the pool.
+_IN_PARSE_WORKER = False
+
+
+async def extract_text_from_upload(file: UploadFile) -> str:
+    # Starlette has already spooled the multipart body (memory for small files,
+    # disk for large ones), so parse straight from it instead of copying to bytes.
+    return await asyncio.to_thread(
+        extract_text_from_stream,
+        stream=file.file,
         filename=file.filename or "",
         content_type=file.content_type,
     )
@@ -26,18 +45,32 @@ def extract_text_from_bytes(
 ) -> str:
     if not raw:
         raise ValueError("Uploaded file is empty.")
+    return _extract_text(raw, filename, content_type)
 
+
+def extract_text_from_stream(
+    stream: BinaryIO,
+    filename: str,
+    content_type: str | None = None,
+) -> str:
+    if stream.seek(0, os.SEEK_END) == 0:
+        raise ValueError("Uploaded file is empty.")
+    stream.seek(0)
+    return _extract_text(stream, filename, content_type)
+
+
+def _extract_text(source: ParseSource, filename: str, content_type: str | None) -> str:
     filename = (filename or "").lower()
     content_type = (content_type or "").lower()
 
     if filename.endswith(".txt") or content_type == "text/plain":
-        text = raw.decode("utf-8", errors="ignore")
+        text = _decode_text(source)
     elif filename.endswith(".pdf") or content_type == "application/pdf":
-        text = _extract_pdf_text(raw)
+        text = _extract_pdf_text(source)
     elif filename.endswith(".docx") or (
         content_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
     ):
-        text = _extract_docx_text(raw)
+        text = _extract_docx_text(source)
     else:
         raise ValueError("Unsupported file type. Use .txt, .pdf, or .docx")
 
@@ -47,21 +80,150 @@ def extract_text_from_bytes(
     return normalized_text[: settings.resume_max_text_characters]
 
 
-def _extract_pdf_text(raw: bytes) -> str:
-    buffer = BytesIO(raw)
+def _decode_text(source: ParseSource) -> str:
+    if isinstance(source, bytes):
+        return source.decode("utf-8", errors="ignore")
+
+    # Decode incrementally and stop once the kept text is past the size limit.
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    buffer = StringIO()
+    kept = 0
+    while chunk := source.read(_TEXT_READ_CHUNK_BYTES):
+        text = decoder.decode(chunk)
+        if not kept:
+            # Leading whitespace is stripped anyway; do not count it toward the limit.
+            text = text.lstrip()
+        kept += buffer.write(text)
+        if kept > settings.resume_max_text_characters:
+            return buffer.getvalue()
+    buffer.write(decoder.decode(b"", final=True))
+    return buffer.getvalue()
+
+
+def _read_bytes(source: ParseSource) -> bytes:
+    if isinstance(source, bytes):
+        return source
+    source.seek(0)
+    return source.read()
+
+
+def _mark_parse_worker() -> None:
+    global _IN_PARSE_WORKER
+    _IN_PARSE_WORKER = True
+
+
+@lru_cache
+def _parse_pool() -> ProcessPoolExecutor:
+    # `spawn` avoids forking a process that already runs server threads.
+    return ProcessPoolExecutor(
+        max_workers=max(1, settings.resume_parse_workers),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_mark_parse_worker,
+    )
+
+
+def submit_text_extraction(
+    raw: bytes,
+    filename: str,
+    content_type: str | None = None,
+) -> Future[str]:
+    """Run `extract_text_from_bytes` in the parser process pool, outside the GIL."""
+    return _parse_pool().submit(
+        extract_text_from_bytes,
+        raw=raw,
+        filename=filename,
+        content_type=content_type,
+    )
+
+
+def _extract_pdf_text(source: ParseSource) -> str:
+    try:
+        text = _extract_pdf_text_pdfium(source)
+    except pdfium.PdfiumError:
+        text = ""
+    if text.strip():
+        return text
+    # PDFium found nothing (or could not open the file); give pdfplumber a try.
+    return _extract_pdf_text_pdfplumber(source)
+
+
+def _extract_pdf_text_pdfium(source: ParseSource) -> str:
     collected: list[str] = []
-    with pdfplumber.open(buffer) as pdf:
-        for page in pdf.pages[: settings.resume_pdf_max_pages]:
-            page_text = page.extract_text() or ""
-            if page_text.strip():
-                collected.append(page_text)
-            current_size = sum(len(item) for item in collected)
-            if current_size >= settings.resume_max_text_characters:
-                break
+    current_size = 0
+    # PDFium is not thread-safe; requests parsing in worker threads share one lock.
+    with _PDFIUM_LOCK:
+        if not isinstance(source, bytes):
+            source.seek(0)
+        pdf = pdfium.PdfDocument(source)
+        try:
+            for index in range(min(len(pdf), settings.resume_pdf_max_pages)):
+                page = pdf[index]
+                text_page = page.get_textpage()
+                try:
+                    page_text = text_page.get_text_range().replace("\r\n", "\n")
+                finally:
+                    text_page.close()
+                    page.close()
+                if page_text and not page_text.isspace():
+                    collected.append(page_text)
+                    current_size += len(page_text)
+                if current_size >= settings.resume_max_text_characters:
+                    break
+        finally:
+            pdf.close()
     return "\n".join(collected)[: settings.resume_max_text_characters]
 
 
-def _extract_docx_text(raw: bytes) -> str:
-    document = Document(BytesIO(raw))
-    lines = [paragraph.text for paragraph in document.paragraphs if paragraph.text.strip()]
+def _extract_pdf_text_pdfplumber(source: ParseSource) -> str:
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    source.seek(0)
+    with pdfplumber.open(source) as pdf:
+        page_count = min(len(pdf.pages), settings.resume_pdf_max_pages)
+        # Pool workers run this too (Gmail imports); only the server process fans pages
+        # out. It may itself be a spawned child under `uvicorn --reload` or `--workers`.
+        fan_out = page_count > 1 and settings.resume_parse_workers > 1 and not _IN_PARSE_WORKER
+        collected = [] if fan_out else _page_texts(pdf.pages[:page_count])
+    if fan_out:
+        collected = _extract_pdf_pages_in_pool(_read_bytes(source), page_count)
+    return "\n".join(collected)[: settings.resume_max_text_characters]
+
+
+def _page_texts(pages) -> list[str]:
+    collected: list[str] = []
+    current_size = 0
+    for page in pages:
+        page_text = page.extract_text() or ""
+        if page_text and not page_text.isspace():
+            collected.append(page_text)
+            current_size += len(page_text)
+        if current_size >= settings.resume_max_text_characters:
+            break
+    return collected
+
+
+def _extract_pdf_page_range(raw: bytes, start: int, stop: int) -> list[str]:
+    with pdfplumber.open(BytesIO(raw)) as pdf:
+        return _page_texts(pdf.pages[start:stop])
+
+
+def _extract_pdf_pages_in_pool(raw: bytes, page_count: int) -> list[str]:
+    """Extract contiguous page ranges on the parser pool and concatenate them in page order."""
+    workers = min(page_count, settings.resume_parse_workers)
+    bounds = [page_count * index // workers for index in range(workers + 1)]
+    futures = [
+        _parse_pool().submit(_extract_pdf_page_range, raw, start, stop)
+        for start, stop in zip(bounds, bounds[1:])
+    ]
+    collected: list[str] = []
+    for future in futures:
+        collected.extend(future.result())
+    return collected
+
+
+def _extract_docx_text(source: ParseSource) -> str:
+    document = Document(BytesIO(source) if isinstance(source, bytes) else source)
+    # `paragraph.text` is rebuilt from the runs on every access, so read it once.
+    texts = (paragraph.text for paragraph in document.paragraphs)
+    lines = [text for text in texts if text and not text.isspace()]
     return "\n".join(lines)[: settings.resume_max_text_characters]
@@ -1,22 +1,184 @@
+from __future__ import annotations
+
+import itertools
+import threading
+from collections.abc import Iterator, MutableMapping
+from typing import Generic, TypeVar
+
+import numpy as np
+
+from app.core.config import settings
 from app.models import Job, Resume
 
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class LazyLRUCache(MutableMapping[K, V], Generic[K, V]):
+    """Bounded mapping with lazy, bulk LRU eviction.
+
+    A read only stamps the entry with a fresh ordinal (a single assignment, so
+    concurrent readers need no lock). Eviction happens once the cache reaches
+    twice its capacity: the `capacity` most recently used entries are kept.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, capacity)
+        self._entries: dict[K, list] = {}
+        self._ordinals = itertools.count()
+
+    def __getitem__(self, key: K) -> V:
+        entry = self._entries[key]
+        entry[1] = next(self._ordinals)
+        return entry[0]
+
+    def __setitem__(self, key: K, value: V) -> None:
+        self._entries[key] = [value, next(self._ordinals)]
+        if len(self._entries) > 2 * self.capacity:
+            self._evict()
+
+    def __delitem__(self, key: K) -> None:
+        del self._entries[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self) -> None:
+        recent = sorted(self._entries.items(), key=lambda item: item[1][1], reverse=True)
+        self._entries = dict(recent[: self.capacity])
+
+
+class EmbeddingMatrix:
+    """Embeddings packed row-wise into one contiguous int8 array, addressed by resume id.
+
+    Each row is stored with its own scale (`int8 row / scale` approximates the vector),
+    so every row uses the full int8 range regardless of its largest component.
+
+    Looking up every stored resume in insertion order returns a view of the array
+    itself, so scoring a job against the whole store needs no gather. Rows carry a
+    last-use stamp; once the array holds twice `capacity` rows it is compacted to
+    the `capacity` most recently used, like LazyLRUCache.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, capacity)
+        self._matrix: np.ndarray | None = None
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._last_used = np.zeros(0, dtype=np.int64)
+        self._ids: list[int] = []
+        self._row_by_id: dict[int, int] = {}
+        self._clock = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, resume_id: object) -> bool:
+        return resume_id in self._row_by_id
+
+    def take(self, ids: list[int]) -> tuple[np.ndarray | None, np.ndarray | None, np.ndarray]:
+        """Return the rows and row scales for `ids` in order, plus the positions not stored here.
+
+        Rows at the missing positions are left for the caller to fill; when nothing is
+        stored yet the rows and scales are None. Lookup and gather happen under one lock,
+        so a concurrent compaction cannot drop a row between the two.
+        """
+        with self._lock:
+            rows = np.fromiter(
+                (self._row_by_id.get(resume_id, -1) for resume_id in ids),
+                dtype=np.intp,
+                count=len(ids),
+            )
+            present = rows >= 0
+            missing = np.flatnonzero(~present)
+            if self._matrix is None:
+                return None, None, missing
+            self._last_used[rows[present]] = next(self._clock)
+            if (
+                not len(missing)
+                and len(ids) == len(self._ids)
+                and np.array_equal(rows, np.arange(len(ids)))
+            ):
+                return self._matrix[: len(ids)], self._scales[: len(ids)], missing
+            gather = np.where(present, rows, 0)
+            return self._matrix[gather], self._scales[gather], missing
+
+    def add(self, vectors: dict[int, tuple[np.ndarray, float]]) -> None:
+        if not vectors:
+            return
+        with self._lock:
+            new = [(resume_id, vector) for resume_id, vector in vectors.items() if resume_id not in self._row_by_id]
+            if not new:
+                return
+            start = len(self._ids)
+            self._reserve(start + len(new), len(new[0][1][0]))
+            stamp = next(self._clock)
+            for offset, (resume_id, (vector, scale)) in enumerate(new):
+                self._matrix[start + offset] = vector
+                self._scales[start + offset] = scale
+                self._row_by_id[resume_id] = start + offset
+                self._ids.append(resume_id)
+            self._last_used[start : start + len(new)] = stamp
+            if len(self._ids) > 2 * self.capacity:
+                self._evict()
+
+    def _reserve(self, rows: int, dim: int) -> None:
+        if self._matrix is not None and rows <= len(self._matrix):
+            return
+        # Grow geometrically so appends stay amortized O(1); a fresh array also keeps
+        # views handed out by `take` unchanged.
+        grown = np.empty((max(rows, 2 * len(self._ids), 64), dim), dtype=np.int8)
+        scales = np.zeros(len(grown), dtype=np.float32)
+        last_used = np.zeros(len(grown), dtype=np.int64)
+        if self._matrix is not None:
+            grown[: len(self._ids)] = self._matrix[: len(self._ids)]
+            scales[: len(self._ids)] = self._scales[: len(self._ids)]
+            last_used[: len(self._ids)] = self._last_used[: len(self._ids)]
+        self._matrix = grown
+        self._scales = scales
+        self._last_used = last_used
+
+    def _evict(self) -> None:
+        size = len(self._ids)
+        keep = np.sort(np.argpartition(-self._last_used[:size], self.capacity - 1)[: self.capacity])
+        self._matrix = np.ascontiguousarray(self._matrix[keep])
+        self._scales = self._scales[keep]
+        self._last_used = self._last_used[keep]
+        self._ids = [self._ids[row] for row in keep]
+        self._row_by_id = {resume_id: row for row, resume_id in enumerate(self._ids)}
+
 
 class InMemoryStore:
     def __init__(self) -> None:
-        self.jobs: list[Job] = []
-        self.resumes: list[Resume] = []
-        self._job_id = 1
-        self._resume_id = 1
+        # Keyed by id; dicts keep insertion order, so `.values()` still lists oldest first.
+        self.jobs: dict[int, Job] = {}
+        self.resumes: dict[int, Resume] = {}
+        self.resume_fingerprints: set[tuple[str, int]] = set()
+        self.resume_vectors = EmbeddingMatrix(settings.resume_embedding_cache_size)
+        # `next()` on a count is a single C call, so concurrent requests never share an id.
+        self._job_ids = itertools.count(1)
+        self._resume_ids = itertools.count(1)
 
     def next_job_id(self) -> int:
-        current = self._job_id
-        self._job_id += 1
-        return current
+        return next(self._job_ids)
+
+    def add_job(self, job: Job) -> None:
+        self.jobs[job.id] = job
+
+    def get_job(self, job_id: int) -> Job | None:
+        return self.jobs.get(job_id)
 
     def next_resume_id(self) -> int:
-        current = self._resume_id
-        self._resume_id += 1
-        return current
+        return next(self._resume_ids)
+
+    def add_resume(self, resume: Resume) -> None:
+        self.resumes[resume.id] = resume
 
 
 store = InMemoryStore()